@@ -0,0 +1,275 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Precompiled language/task classifier for chat messages.
+# Prose is scanned token by token against a keyword trie (so a stray letter
+# "c" is not C++ and "fix" never matches inside "prefix"); code, fenced or
+# pasted, is scored with syntax heuristics. All patterns are compiled at import time.
+#
+# Words that are also ordinary English ("node", "express", "spring") weigh 1,
+# below MIN_LANGUAGE_SCORE, so they only decide the language together with a
+# second signal; unambiguous phrases ("node js", "spring boot") weigh more.
+
+DEFAULT_LANGUAGE = "python"
+DEFAULT_TASK = "generate"
+
+# Less evidence than this for the best language falls back to DEFAULT_LANGUAGE
+MIN_LANGUAGE_SCORE = 2.0
+# Evidence at which confidence saturates; below it confidence scales down linearly
+FULL_LANGUAGE_SCORE = 3.0
+FULL_TASK_SCORE = 3.0
+
+# A language named right after one of these words is the target of the request
+# ("convert this python to java"), so its unambiguous mentions count double
+TARGET_PREFIXES = frozenset({"to", "into", "in"})
+TARGET_WEIGHT = 2.0
+
+# Ties between tasks resolve in this order, matching the historical precedence
+TASK_PRIORITY = ["explain", "refactor", "debug", "generate"]
+
+LANGUAGE_KEYWORDS: Dict[str, List[Tuple[str, float]]] = {
+    "python": [
+        ("python", 3), ("python3", 3), ("py", 2), ("pythonic", 2), ("django", 2), ("flask", 1),
+        ("fastapi", 2), ("pandas", 1), ("numpy", 2), ("pytest", 2), ("pip", 1), ("pip install", 2)
+    ],
+    "javascript": [
+        ("javascript", 3), ("js", 2), ("node", 1), ("nodejs", 3), ("node js", 3), ("express", 1),
+        ("expressjs", 3), ("express js", 3), ("react", 1), ("reactjs", 3), ("react js", 3),
+        ("react hook", 3), ("react component", 3), ("react app", 3), ("react native", 3),
+        ("vue", 2), ("vue js", 3), ("typescript", 3), ("ts", 1), ("npm", 2), ("jest", 1)
+    ],
+    "java": [
+        ("java", 3), ("jvm", 2), ("spring", 1), ("spring boot", 3), ("spring mvc", 3), ("junit", 2),
+        ("maven", 2), ("gradle", 2)
+    ],
+    "cpp": [
+        ("c++", 3), ("cpp", 3), ("cplusplus", 3), ("in c", 2), ("using c", 2), ("c code", 2),
+        ("c program", 2), ("c function", 2), ("c language", 2), ("stl", 2), ("g++", 2), ("clang", 1)
+    ]
+}
+
+TASK_KEYWORDS: Dict[str, List[Tuple[str, float]]] = {
+    "generate": [
+        ("write", 1), ("create", 1), ("generate", 1), ("implement", 1), ("build", 1),
+        ("error handling", 2), ("exception handling", 2), ("handle errors", 2), ("handle error", 2),
+        ("handles errors", 2), ("handle exceptions", 2), ("handles exceptions", 2)
+    ],
+    "explain": [
+        ("explain", 3), ("explanation", 3), ("understand", 2), ("what does", 3), ("how does", 2),
+        ("walk me through", 3), ("describe", 2)
+    ],
+    "refactor": [
+        ("refactor", 3), ("refactoring", 3), ("improve", 2), ("optimize", 2), ("optimise", 2),
+        ("clean up", 2), ("simplify", 2), ("rewrite", 1)
+    ],
+    "debug": [
+        ("debug", 3), ("fix", 3), ("fixing", 3), ("error", 2), ("errors", 2), ("bug", 3), ("bugs", 3),
+        ("crash", 2), ("crashes", 2), ("exception", 2), ("traceback", 3), ("broken", 2), ("failing", 2),
+        ("doesn't work", 2), ("not working", 2), ("not work", 2), ("isn't working", 2), ("won't work", 2),
+        ("doesn't compile", 2), ("wrong output", 2)
+    ]
+}
+
+# Info-string aliases for fenced code blocks (```cpp ... ```)
+FENCE_ALIASES = {
+    "python": "python", "py": "python", "python3": "python",
+    "javascript": "javascript", "js": "javascript", "node": "javascript", "jsx": "javascript",
+    "typescript": "javascript", "ts": "javascript",
+    "java": "java",
+    "cpp": "cpp", "c++": "cpp", "cc": "cpp", "cxx": "cpp", "hpp": "cpp", "c": "cpp", "h": "cpp"
+}
+FENCE_WEIGHT = 10.0
+
+# (literal hint, pattern, weight). A pattern only runs when its hint occurs in the
+# code, which skips most regex scans; an empty hint always runs.
+SYNTAX_PATTERNS: Dict[str, List[Tuple[str, str, float]]] = {
+    "python": [
+        ("#!", r"^#!.*\bpython", 8), ("def ", r"^\s*def \w+\(.*\)\s*(->.*)?:\s*$", 4),
+        ("class ", r"^\s*class \w+(\(.*\))?:\s*$", 4),
+        ("import ", r"^\s*(from [\w.]+ )?import [\w.]+(, [\w.]+)*( as \w+)?\s*$", 2),
+        (":", r"^\s*(elif|except)\b.*:\s*$", 3), ("self.", r"\bself\.", 2), ("print(", r"\bprint\(", 1),
+        ("", r"\b(None|True|False)\b", 1), ("__name__", r"^\s*if __name__ == ", 5)
+    ],
+    "javascript": [
+        ("#!", r"^#!.*\bnode\b", 8), ("function", r"\bfunction\s*\w*\s*\(", 3),
+        ("=", r"\b(const|let|var)\s+\w+\s*=", 3), ("=>", r"=>", 2), ("console.", r"\bconsole\.\w+\(", 4),
+        ("require(", r"\brequire\(['\"]", 4), ("from", r"^\s*(export|import)\b.*\bfrom\s+['\"]", 4),
+        ("==", r"===|!==", 2), ("", r"\b(undefined|null)\b", 1), ("", r"\bdocument\.|\bwindow\.", 3)
+    ],
+    "java": [
+        ("public", r"\bpublic\s+(final\s+)?(class|interface|enum)\s+\w+", 5),
+        ("main", r"\bpublic static void main\s*\(", 6), ("System.", r"\bSystem\.(out|err)\.print", 6),
+        ("java.", r"^\s*import java\.", 6), ("package", r"^\s*package [\w.]+;", 5), ("@Override", r"@Override\b", 4),
+        ("", r"\b(private|protected|public)\s+(static\s+)?[\w<>\[\]]+\s+\w+\s*\(", 3),
+        ("String[]", r"\bString\[\]", 3), ("new ", r"\bnew \w+(<.*>)?\(", 1)
+    ],
+    "cpp": [
+        ("#include", r"^\s*#include\s*[<\"]", 8), ("std::", r"\bstd::", 5), ("", r"\bcout\s*<<|\bcin\s*>>", 5),
+        ("using namespace", r"using namespace std", 6), ("template", r"\btemplate\s*<", 4),
+        ("main", r"\bint main\s*\(", 3), ("nullptr", r"\bnullptr\b", 4), ("->", r"\w+->\w+", 1),
+        ("<", r"\b(vector|unordered_map|map)<", 3), ("(", r"\b(printf|scanf|malloc)\(", 2)
+    ]
+}
+
+# Layout heuristics: brace/semicolon-terminated lines vs colon blocks with indentation
+BRACE_LANGUAGES = ("javascript", "java", "cpp")
+BRACE_LINE_WEIGHT = 0.5
+INDENT_BLOCK_WEIGHT = 1.0
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\+\+)?(?:'[a-z]+)?")
+FENCE_RE = re.compile(r"```[ \t]*([\w+#-]*)[^\n]*\n(.*?)(?:```|\Z)", re.DOTALL)
+CODE_LINE_RE = re.compile(
+    r"^\s*(#!|#include\b|def |class |import |from \S+ import |package |public |private |protected |"
+    r"function\b|const |let |var |return\b.*;|@\w+|//|/\*|\}|std::)"
+    r"|[{};]\s*$|^\s*(if|for|while|elif|else|try|except)\b.*:\s*$|^(\t| {2,})\S"
+)
+BRACE_LINE_RE = re.compile(r"[{};]\s*$")
+COLON_LINE_RE = re.compile(r":\s*(#.*)?$")
+INDENTED_RE = re.compile(r"^(\t| {2,})\S")
+
+COMPILED_SYNTAX = [
+    (language, hint, re.compile(pattern, re.MULTILINE), weight)
+    for language, patterns in SYNTAX_PATTERNS.items()
+    for hint, pattern, weight in patterns
+]
+
+
+def _tokenize(text: str) -> List[str]:
+    # Apostrophe suffixes stay attached ("doesn't") so phrase keywords can match them
+    return TOKEN_RE.findall(text.lower())
+
+
+def _build_trie(keywords: Dict[str, List[Tuple[str, float]]]) -> dict:
+    # Token-level trie; a terminal node stores the (label, weight) pairs it emits
+    root: dict = {}
+    for label, entries in keywords.items():
+        for phrase, weight in entries:
+            node = root
+            for token in _tokenize(phrase):
+                node = node.setdefault(token, {})
+            node.setdefault(None, []).append((label, weight))
+    return root
+
+
+LANGUAGE_TRIE = _build_trie(LANGUAGE_KEYWORDS)
+TASK_TRIE = _build_trie(TASK_KEYWORDS)
+
+
+def _scan(tokens: List[str], trie: dict, last_seen: Optional[Dict[str, int]] = None) -> Dict[str, float]:
+    # Leftmost-longest matching: a phrase consumes its tokens, so "error handling"
+    # is not also scored as "error", nor "spring boot" as "spring". With
+    # ``last_seen``, mentions after TARGET_PREFIXES are boosted and the position
+    # of each label's last mention is recorded for tie-breaking.
+    scores: Dict[str, float] = {}
+    start = 0
+    while start < len(tokens):
+        node, matched, end = trie, None, start + 1
+        for position in range(start, len(tokens)):
+            node = node.get(tokens[position])
+            if node is None:
+                break
+            if None in node:
+                matched, end = node[None], position + 1
+        for label, weight in matched or ():
+            if last_seen is not None:
+                last_seen[label] = start
+                if weight >= MIN_LANGUAGE_SCORE and start and tokens[start - 1] in TARGET_PREFIXES:
+                    weight *= TARGET_WEIGHT
+            scores[label] = scores.get(label, 0.0) + weight
+        start = end
+    return scores
+
+
+def split_code(message: str) -> Tuple[str, str, Dict[str, float]]:
+    """Split a message into (prose, code, fence_scores)."""
+    fence_scores: Dict[str, float] = {}
+    if "```" in message:
+        code_parts = []
+        for match in FENCE_RE.finditer(message):
+            language = FENCE_ALIASES.get(match.group(1).lower())
+            if language:
+                fence_scores[language] = fence_scores.get(language, 0.0) + FENCE_WEIGHT
+            code_parts.append(match.group(2))
+        return FENCE_RE.sub("\n", message), "\n".join(code_parts), fence_scores
+
+    prose_lines, code_lines = [], []
+    for line in message.splitlines():
+        (code_lines if CODE_LINE_RE.search(line) else prose_lines).append(line)
+    # A single code-looking line in a sentence is usually prose ("fix the error;")
+    if len(code_lines) < 2:
+        return message, "", fence_scores
+    return "\n".join(prose_lines), "\n".join(code_lines), fence_scores
+
+
+def score_code(code: str) -> Dict[str, float]:
+    scores: Dict[str, float] = {}
+    if not code.strip():
+        return scores
+    for language, hint, pattern, weight in COMPILED_SYNTAX:
+        if hint in code:
+            hits = len(pattern.findall(code))
+            if hits:
+                scores[language] = scores.get(language, 0.0) + weight * hits
+
+    lines = code.splitlines()
+    brace_lines = sum(1 for line in lines if BRACE_LINE_RE.search(line))
+    indent_blocks = sum(
+        1 for line, following in zip(lines, lines[1:])
+        if COLON_LINE_RE.search(line) and INDENTED_RE.match(following) and not BRACE_LINE_RE.search(line)
+    )
+    if brace_lines:
+        for language in BRACE_LANGUAGES:
+            if language in scores:
+                scores[language] += BRACE_LINE_WEIGHT * brace_lines
+    if indent_blocks:
+        scores["python"] = scores.get("python", 0.0) + INDENT_BLOCK_WEIGHT * indent_blocks
+    return scores
+
+
+def _best(
+    scores: Dict[str, float], order: List[str], full_score: float, last_seen: Optional[Dict[str, int]] = None
+) -> Tuple[Optional[str], float]:
+    # Confidence is the winner's share of the evidence, scaled by how much
+    # evidence there is: one weak hit is not a confident answer. Ties go to the
+    # label mentioned last when positions are known, then to ``order``.
+    if not scores:
+        return None, 0.0
+    last_seen = last_seen or {}
+    label = max(scores, key=lambda key: (scores[key], last_seen.get(key, -1), -order.index(key)))
+    share = scores[label] / sum(scores.values())
+    return label, share * min(1.0, scores[label] / full_score)
+
+
+class Classification(NamedTuple):
+    language: str
+    task: str
+    language_confidence: float
+    task_confidence: float
+
+
+def classify(message: str) -> Classification:
+    prose, code, fence_scores = split_code(message)
+    prose_tokens = _tokenize(prose)
+
+    task_scores = _scan(prose_tokens or _tokenize(message), TASK_TRIE)
+    task, task_confidence = _best(task_scores, TASK_PRIORITY, FULL_TASK_SCORE)
+    task = task or DEFAULT_TASK
+
+    # Code the user pasted decides the language when they want it explained,
+    # fixed or refactored; otherwise an explicit mention in the prose wins, and
+    # among several the target one ("convert this python to java").
+    code_scores = dict(score_code(code))
+    for language, score in fence_scores.items():
+        code_scores[language] = code_scores.get(language, 0.0) + score
+    # Either source only counts with at least MIN_LANGUAGE_SCORE of evidence.
+    code_scores = code_scores if max(code_scores.values(), default=0.0) >= MIN_LANGUAGE_SCORE else {}
+    mentions: Dict[str, int] = {}
+    prose_scores = _scan(prose_tokens, LANGUAGE_TRIE, mentions)
+    prose_scores = prose_scores if max(prose_scores.values(), default=0.0) >= MIN_LANGUAGE_SCORE else {}
+    languages = list(LANGUAGE_KEYWORDS)
+    if code_scores and (task != "generate" or not prose_scores):
+        language, language_confidence = _best(code_scores, languages, FULL_LANGUAGE_SCORE)
+    else:
+        language, language_confidence = _best(prose_scores, languages, FULL_LANGUAGE_SCORE, mentions)
+
+    return Classification(language or DEFAULT_LANGUAGE, task, round(language_confidence, 3), round(task_confidence, 3))
@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Optional, Dict, Any, List
+
+# SQLite-backed conversation history, one row per conversation_id.
+# Summary columns are kept separate from the compressed message body so that
+# listing pages of history never touches (or decompresses) full messages.
+HISTORY_DB_PATH = os.getenv(
+    "HISTORY_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.db")
+)
+
+TITLE_MAX_CHARS = 80
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(HISTORY_DB_PATH, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""CREATE TABLE IF NOT EXISTS conversations (
+            conversation_id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            language TEXT NOT NULL,
+            message_count INTEGER NOT NULL,
+            updated_at REAL NOT NULL,
+            body BLOB NOT NULL
+        )""")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at DESC)")
+        _conn.commit()
+    return _conn
+
+
+def _summarize(messages: List[Dict[str, Any]]) -> tuple[str, str]:
+    title = next((m.get("content", "") for m in messages if m.get("role") == "user"), "") or "Untitled"
+    title = " ".join(title.split())
+    if len(title) > TITLE_MAX_CHARS:
+        title = title[:TITLE_MAX_CHARS - 1] + "…"
+    language = next((m["language"] for m in reversed(messages) if m.get("language")), "")
+    return title, language
+
+
+def _format_summary(conversation_id: str, title: str, language: str, message_count: int, updated_at: float) -> Dict[str, Any]:
+    return {
+        "conversation_id": conversation_id,
+        "title": title,
+        "language": language,
+        "message_count": message_count,
+        "updated_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(updated_at))
+    }
+
+
+def save_conversation(conversation_id: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    title, language = _summarize(messages)
+    body = zlib.compress(json.dumps(messages, separators=(",", ":")).encode("utf-8"))
+    updated_at = time.time()
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?, ?, ?)",
+            (conversation_id, title, language, len(messages), updated_at, body)
+        )
+        conn.commit()
+    return _format_summary(conversation_id, title, language, len(messages), updated_at)
+
+
+def list_conversations(offset: int, limit: int) -> tuple[List[Dict[str, Any]], int]:
+    with _lock:
+        conn = _connection()
+        total = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        rows = conn.execute(
+            "SELECT conversation_id, title, language, message_count, updated_at FROM conversations "
+            "ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+            (limit, offset)
+        ).fetchall()
+    return [_format_summary(*row) for row in rows], total
+
+
+def load_conversation(conversation_id: str) -> Optional[List[Dict[str, Any]]]:
+    with _lock:
+        row = _connection().execute(
+            "SELECT body FROM conversations WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    return json.loads(zlib.decompress(row[0]))
+
+
+def delete_conversation(conversation_id: str) -> bool:
+    with _lock:
+        conn = _connection()
+        cursor = conn.execute("DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,))
+        conn.commit()
+    return cursor.rowcount > 0
@@ -4,13 +4,25 @@ import subprocess
 import tempfile
 import json
 import time
-from typing import Optional, Dict, Any
-from fastapi import FastAPI, HTTPException
+import asyncio
+import secrets
+import psutil
+import orjson
+from typing import Optional, Dict, Any, List, Set, Callable, Awaitable
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect, Request, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field, ValidationError
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
+import history_store
+from classifier import classify
+from tracing import span, current_traceparent
+import profiler
+import memory
+from memory import MemoryStore, EntryTooLarge
+from responses import APIResponse, CompressionMiddleware, field_projection, project_items, project_fields, dumps
 
 load_dotenv()
 
@@ -61,11 +73,45 @@ class SharedCode(BaseModel):
     description: str
     created_at: str
 
+class ProfileRequest(BaseModel):
+    seconds: Optional[float] = Field(None, gt=0, le=300)
+    requests: Optional[int] = Field(None, ge=1, le=10000)
+    interval_ms: float = Field(5.0, ge=1, le=1000)
+
+class HistorySaveRequest(BaseModel):
+    conversation_id: str
+    messages: List[Dict[str, Any]]
+
+class HistorySummary(BaseModel):
+    conversation_id: str
+    title: str
+    language: str
+    message_count: int
+    updated_at: str
+
+class HistoryPage(BaseModel):
+    items: List[HistorySummary]
+    total: int
+    offset: int
+    limit: int
+
+class HistoryConversation(BaseModel):
+    conversation_id: str
+    messages: List[Dict[str, Any]]
+
 # Initialize LLM
 llm = ChatOpenAI(model="gpt-4o", temperature=0, api_key=api_key)
 
-# In-memory storage for shared code (use database in production)
-shared_codes: Dict[str, Dict] = {}
+# WebSocket flow control: concurrent requests and queued outbound events per connection
+WS_MAX_INFLIGHT = int(os.getenv("WS_MAX_INFLIGHT", "4"))
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+
+# Admin endpoints (profiling) are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# In-memory storage for shared code (use database in production); registered
+# with the memory accountant so the oldest snippets are evicted under budget
+shared_codes = MemoryStore("shared_codes", weight=4.0)
 
 # Prompts
 CODE_GEN_PROMPT = """You are an expert {language} programmer. 
@@ -141,67 +187,62 @@ Return ONLY the test code without markdown formatting or explanations."""
 
 # Processing functions
 async def detect_language_and_task(message: str, provided_language: str) -> tuple[str, str]:
-    message_lower = message.lower()
+    with span("detect_language_and_task") as attributes:
+        classification = classify(message)
+        attributes.update(classification._asdict())
     
-    # Use provided language or detect
+    # Use provided language or detected one
     if provided_language and provided_language != "auto":
-        language = provided_language
-    else:
-        language_map = {
-            "python": "python", "py": "python",
-            "javascript": "javascript", "js": "javascript", "node": "javascript",
-            "java": "java",
-            "c++": "cpp", "cpp": "cpp", "c": "cpp"
-        }
+        return provided_language, classification.task
+    return classification.language, classification.task
+
+# Streaming callback: receives each text delta as the LLM produces it
+TokenCallback = Callable[[str], Awaitable[None]]
+
+async def complete(prompt: str, stage: str, on_token: Optional[TokenCallback] = None) -> str:
+    messages = [HumanMessage(content=prompt)]
+    with span(f"llm.{stage}", prompt_chars=len(prompt), streaming=on_token is not None) as attributes:
+        if on_token is None:
+            response = await llm.ainvoke(messages)
+            attributes["response_chars"] = len(response.content)
+            return response.content
         
-        language = "python"  # default
-        for key, lang in language_map.items():
-            if key in message_lower:
-                language = lang
-                break
-    
-    # Detect task type
-    task_type = "generate"
-    if any(word in message_lower for word in ["explain", "understand", "what does"]):
-        task_type = "explain"
-    elif any(word in message_lower for word in ["refactor", "improve", "optimize"]):
-        task_type = "refactor"
-    elif any(word in message_lower for word in ["debug", "fix", "error", "bug"]):
-        task_type = "debug"
-    
-    return language, task_type
-
-async def explain_code(code: str, language: str) -> str:
+        # Cancelling the awaiting task closes the stream, so the provider stops generating
+        parts = []
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                parts.append(chunk.content)
+                await on_token(chunk.content)
+        attributes["chunks"] = len(parts)
+        attributes["response_chars"] = sum(len(part) for part in parts)
+        return "".join(parts)
+
+async def explain_code(code: str, language: str, on_token: Optional[TokenCallback] = None) -> str:
     prompt = EXPLAIN_PROMPT.format(language=language, code=code)
-    response = await llm.ainvoke([HumanMessage(content=prompt)])
-    return response.content
+    return await complete(prompt, "explain", on_token)
 
-async def debug_code(code: str, language: str) -> str:
+async def debug_code(code: str, language: str, on_token: Optional[TokenCallback] = None) -> str:
     prompt = DEBUG_PROMPT.format(language=language, code=code)
-    response = await llm.ainvoke([HumanMessage(content=prompt)])
-    return response.content
+    return await complete(prompt, "debug", on_token)
 
-async def generate_code(query: str, language: str, task_type: str = "generate") -> str:
+async def generate_code(query: str, language: str, task_type: str = "generate", on_token: Optional[TokenCallback] = None) -> str:
     if task_type == "debug":
-        return await debug_code(query, language)
+        return await debug_code(query, language, on_token)
     elif task_type == "explain":
-        return await explain_code(query, language)
+        return await explain_code(query, language, on_token)
     else:
         prompt = CODE_GEN_PROMPT.format(language=language, query=query)
-        response = await llm.ainvoke([HumanMessage(content=prompt)])
-        return response.content
+        return await complete(prompt, "generate", on_token)
 
-async def analyze_complexity(code: str, language: str) -> str:
+async def analyze_complexity(code: str, language: str, on_token: Optional[TokenCallback] = None) -> str:
     prompt = COMPLEXITY_PROMPT.format(language=language, code=code)
-    response = await llm.ainvoke([HumanMessage(content=prompt)])
-    return response.content
+    return await complete(prompt, "complexity", on_token)
 
-async def generate_docs(code: str, complexity: str, language: str) -> str:
+async def generate_docs(code: str, complexity: str, language: str, on_token: Optional[TokenCallback] = None) -> str:
     prompt = DOCS_PROMPT.format(code=code, complexity=complexity, language=language)
-    response = await llm.ainvoke([HumanMessage(content=prompt)])
-    return response.content
+    return await complete(prompt, "docs", on_token)
 
-async def generate_tests(code: str, language: str) -> str:
+async def generate_tests(code: str, language: str, on_token: Optional[TokenCallback] = None) -> str:
     # Determine testing framework based on language
     frameworks = {
         "python": "pytest or unittest",
@@ -212,11 +253,58 @@ async def generate_tests(code: str, language: str) -> str:
     framework = frameworks.get(language, "appropriate testing framework")
     
     prompt = TEST_PROMPT.format(language=language, code=code, framework=framework)
-    response = await llm.ainvoke([HumanMessage(content=prompt)])
-    return response.content
+    return await complete(prompt, "tests", on_token)
 
-# FastAPI app
-app = FastAPI()
+# Stage callback: receives (stage, delta) while a multi-stage pipeline streams
+StageCallback = Callable[[str, str], Awaitable[None]]
+
+def stage_callback(on_stage: Optional[StageCallback], stage: str) -> Optional[TokenCallback]:
+    if on_stage is None:
+        return None
+    return lambda delta: on_stage(stage, delta)
+
+async def run_chat(request: ChatRequest, on_stage: Optional[StageCallback] = None) -> ChatResponse:
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+    
+    # Process the request step by step
+    language, task_type = await detect_language_and_task(request.message, request.language)
+    
+    if task_type == "debug":
+        debug_analysis = await generate_code(request.message, language, task_type, stage_callback(on_stage, "code"))
+        return ChatResponse(
+            conversation_id=conversation_id,
+            message=request.message,
+            code=debug_analysis,
+            complexity="Debug Analysis - See code section for details",
+            docs="Debugging assistance provided with error identification and solutions",
+            language=language
+        )
+    elif task_type == "explain":
+        explanation = await generate_code(request.message, language, task_type, stage_callback(on_stage, "code"))
+        return ChatResponse(
+            conversation_id=conversation_id,
+            message=request.message,
+            code=explanation,
+            complexity="Code Explanation - See code section for details",
+            docs="Snippet-wise code explanation provided",
+            language=language
+        )
+    else:
+        code = await generate_code(request.message, language, task_type, stage_callback(on_stage, "code"))
+        complexity = await analyze_complexity(code, language, stage_callback(on_stage, "complexity"))
+        docs = await generate_docs(code, complexity, language, stage_callback(on_stage, "docs"))
+    
+    return ChatResponse(
+        conversation_id=conversation_id,
+        message=request.message,
+        code=code,
+        complexity=complexity,
+        docs=docs,
+        language=language
+    )
+
+# FastAPI app: orjson responses, opt-in ?fields= projection on every route
+app = FastAPI(default_response_class=APIResponse, dependencies=[Depends(field_projection)])
 
 app.add_middleware(
     CORSMiddleware,
@@ -226,6 +314,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Registered before the tracing middleware so compression runs inside the request span
+app.add_middleware(CompressionMiddleware)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Continue the caller's trace (W3C traceparent header) or start a new one
+    try:
+        with span(
+            f"{request.method} {request.url.path}",
+            kind="SERVER",
+            traceparent=request.headers.get("traceparent", ""),
+            **{"http.method": request.method, "http.target": request.url.path}
+        ) as attributes:
+            traceparent = current_traceparent()
+            response = await call_next(request)
+            attributes["http.status_code"] = response.status_code
+    finally:
+        # Requests that raise still count towards a "next N requests" profile
+        if not request.url.path.startswith("/api/admin/"):
+            profiler.request_finished()
+    response.headers["traceparent"] = traceparent
+    return response
+
+def require_admin(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
 @app.get("/")
 async def root():
     return {"status": "ok"}
@@ -233,44 +350,7 @@ async def root():
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest) -> ChatResponse:
     try:
-        conversation_id = request.conversation_id or str(uuid.uuid4())
-        
-        # Process the request step by step
-        language, task_type = await detect_language_and_task(request.message, request.language)
-        
-        if task_type == "debug":
-            debug_analysis = await generate_code(request.message, language, task_type)
-            return ChatResponse(
-                conversation_id=conversation_id,
-                message=request.message,
-                code=debug_analysis,
-                complexity="Debug Analysis - See code section for details",
-                docs="Debugging assistance provided with error identification and solutions",
-                language=language
-            )
-        elif task_type == "explain":
-            explanation = await generate_code(request.message, language, task_type)
-            return ChatResponse(
-                conversation_id=conversation_id,
-                message=request.message,
-                code=explanation,
-                complexity="Code Explanation - See code section for details",
-                docs="Snippet-wise code explanation provided",
-                language=language
-            )
-        else:
-            code = await generate_code(request.message, language, task_type)
-            complexity = await analyze_complexity(code, language)
-            docs = await generate_docs(code, complexity, language)
-        
-        return ChatResponse(
-            conversation_id=conversation_id,
-            message=request.message,
-            code=code,
-            complexity=complexity,
-            docs=docs,
-            language=language
-        )
+        return await run_chat(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -279,19 +359,22 @@ async def share_code(request: ShareRequest) -> ShareResponse:
     try:
         share_id = str(uuid.uuid4())[:8]
         
-        shared_codes[share_id] = {
-            "share_id": share_id,
-            "code": request.code,
-            "language": request.language,
-            "title": request.title,
-            "description": request.description,
-            "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
+        with span("storage.shared.put", share_id=share_id):
+            shared_codes[share_id] = {
+                "share_id": share_id,
+                "code": request.code,
+                "language": request.language,
+                "title": request.title,
+                "description": request.description,
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
         
         return ShareResponse(
             share_id=share_id,
             share_url=f"http://localhost:8501?share={share_id}"
         )
+    except EntryTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -305,14 +388,224 @@ async def generate_tests_endpoint(request: TestRequest) -> TestResponse:
 
 @app.get("/api/shared/{share_id}", response_model=SharedCode)
 async def get_shared_code(share_id: str) -> SharedCode:
-    if share_id not in shared_codes:
+    with span("storage.shared.get", share_id=share_id):
+        shared = shared_codes.get(share_id)
+    if shared is None:
         raise HTTPException(status_code=404, detail="Shared code not found")
     
-    return SharedCode(**shared_codes[share_id])
+    return SharedCode(**shared)
 
-@app.get("/api/shared")
+@app.get("/api/shared", dependencies=[Depends(project_items("shared_codes"))])
 async def list_shared_codes():
-    return {"shared_codes": list(shared_codes.values())}
+    with span("storage.shared.list") as attributes:
+        snippets = list(shared_codes.values())
+        attributes["count"] = len(snippets)
+    return {"shared_codes": snippets}
+
+# History endpoints are sync so SQLite I/O runs in the threadpool, off the event loop
+@app.post("/api/history", response_model=HistorySummary)
+def save_history(request: HistorySaveRequest) -> HistorySummary:
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="Conversation has no messages")
+    try:
+        with span("storage.history.save", conversation_id=request.conversation_id, messages=len(request.messages)):
+            summary = history_store.save_conversation(request.conversation_id, request.messages)
+        return HistorySummary(**summary)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/history", response_model=HistoryPage, dependencies=[Depends(project_items("items"))])
+def list_history(offset: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=100)) -> HistoryPage:
+    with span("storage.history.list", offset=offset, limit=limit):
+        items, total = history_store.list_conversations(offset, limit)
+    return HistoryPage(items=[HistorySummary(**item) for item in items], total=total, offset=offset, limit=limit)
+
+@app.get("/api/history/{conversation_id}", response_model=HistoryConversation)
+def get_history(conversation_id: str) -> HistoryConversation:
+    with span("storage.history.load", conversation_id=conversation_id):
+        messages = history_store.load_conversation(conversation_id)
+    if messages is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return HistoryConversation(conversation_id=conversation_id, messages=messages)
+
+@app.delete("/api/history/{conversation_id}")
+def delete_history(conversation_id: str):
+    with span("storage.history.delete", conversation_id=conversation_id):
+        deleted = history_store.delete_conversation(conversation_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {"status": "deleted"}
+
+# WebSocket chat channel. Client frames are JSON objects:
+#   {"type": "chat", "id": ..., "message": ..., "conversation_id"?: ..., "language"?: ...}
+#   {"type": "tests" | "explain", "id": ..., "code": ..., "language": ...}
+#   {"type": "cancel", "id": ...}
+# Request frames may carry a "traceparent" to continue the caller's trace and a
+# "fields" list to project the result data, like ?fields= on HTTP routes.
+# Server frames carry the request id and one of the types
+#   started, delta {stage, content}, result {data}, cancelled, error {detail}.
+async def run_ws_request(kind: str, payload: Dict[str, Any], emit: Callable[[Dict[str, Any]], Awaitable[None]]) -> Dict[str, Any]:
+    async def on_stage(stage: str, delta: str):
+        await emit({"type": "delta", "stage": stage, "content": delta})
+    
+    if kind == "chat":
+        response = await run_chat(ChatRequest(**payload), on_stage)
+        return response.model_dump()
+    
+    request = TestRequest(**payload)
+    if kind == "tests":
+        tests = await generate_tests(request.code, request.language, stage_callback(on_stage, "tests"))
+        return TestResponse(tests=tests, language=request.language).model_dump()
+    explanation = await explain_code(request.code, request.language, stage_callback(on_stage, "explain"))
+    return {"explanation": explanation, "language": request.language}
+
+@app.websocket("/ws/chat")
+async def ws_chat(websocket: WebSocket):
+    await websocket.accept()
+    # Bounded outbox: when the client reads slowly, producers block on put(),
+    # which in turn stops pulling tokens from the LLM stream
+    outbox: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+    send_lock = asyncio.Lock()
+    # In-flight requests by id. An id stays reserved until its final frame is
+    # queued, so a cancelled request's frames never interleave with a new one's
+    tasks: Dict[str, asyncio.Task] = {}
+    cancelling: Set[str] = set()
+    closed = False
+    
+    async def send(event: Dict[str, Any]):
+        async with send_lock:
+            await websocket.send_text(dumps(event).decode("utf-8"))
+    
+    async def sender():
+        while True:
+            await send(await outbox.get())
+    
+    async def handle(request_id: str, kind: str, payload: Dict[str, Any], traceparent: Optional[str], fields: Optional[List[str]]):
+        async def emit(event: Dict[str, Any]):
+            if not closed:
+                await outbox.put({"id": request_id, **event})
+        
+        try:
+            await emit({"type": "started"})
+            with span(f"ws.{kind}", kind="SERVER", traceparent=traceparent, **{"ws.request_id": request_id}):
+                result = await run_ws_request(kind, payload, emit)
+            if fields:
+                result = project_fields(result, frozenset(fields))
+            await emit({"type": "result", "data": result})
+        except asyncio.CancelledError:
+            await emit({"type": "cancelled"})
+        except ValidationError as e:
+            await emit({"type": "error", "detail": e.errors(include_url=False, include_context=False)})
+        except Exception as e:
+            await emit({"type": "error", "detail": str(e)})
+    
+    def release(request_id: str):
+        tasks.pop(request_id, None)
+        cancelling.discard(request_id)
+    
+    async def report_cancelled(request_id: str):
+        await outbox.put({"id": request_id, "type": "cancelled"})
+        release(request_id)
+    
+    def finished(request_id: str, task: asyncio.Task):
+        # Runs even when the task was cancelled before handle() started, in
+        # which case its own except branch never ran and the client is told here.
+        # The id is released only once the final frame is queued.
+        if task.cancelled() and not closed:
+            try:
+                outbox.put_nowait({"id": request_id, "type": "cancelled"})
+            except asyncio.QueueFull:
+                asyncio.create_task(report_cancelled(request_id))
+                return
+        release(request_id)
+    
+    sender_task = asyncio.create_task(sender())
+    try:
+        while True:
+            try:
+                frame = orjson.loads(await websocket.receive_text())
+                kind = frame.pop("type")
+                request_id = str(frame.pop("id"))
+            except (ValueError, KeyError, AttributeError, TypeError):
+                await send({"id": None, "type": "error", "detail": "Frames must be JSON objects with 'type' and 'id'"})
+                continue
+            
+            if kind == "cancel":
+                task = tasks.get(request_id)
+                if task is None:
+                    await send({"id": request_id, "type": "error", "detail": "No in-flight request with this id"})
+                elif request_id not in cancelling:
+                    cancelling.add(request_id)
+                    task.cancel()
+            elif kind not in ("chat", "tests", "explain"):
+                await send({"id": request_id, "type": "error", "detail": f"Unknown request type: {kind}"})
+            elif request_id in cancelling:
+                await send({"id": request_id, "type": "error", "detail": "Request id is still being cancelled; wait for its 'cancelled' frame"})
+            elif request_id in tasks:
+                await send({"id": request_id, "type": "error", "detail": "Request id is already in flight"})
+            elif len(tasks) >= WS_MAX_INFLIGHT:
+                await send({"id": request_id, "type": "error", "detail": f"Too many in-flight requests (max {WS_MAX_INFLIGHT})"})
+            else:
+                traceparent = frame.pop("traceparent", None) or websocket.headers.get("traceparent", "")
+                fields = frame.pop("fields", None)
+                if fields is not None and not (isinstance(fields, list) and all(isinstance(field, str) for field in fields)):
+                    await send({"id": request_id, "type": "error", "detail": "'fields' must be a list of strings"})
+                    continue
+                task = asyncio.create_task(handle(request_id, kind, frame, traceparent, fields))
+                tasks[request_id] = task
+                task.add_done_callback(lambda task, request_id=request_id: finished(request_id, task))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closed = True
+        # Client went away: stop every in-flight pipeline so no more tokens are spent
+        for task in list(tasks.values()):
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*list(tasks.values()), return_exceptions=True)
+        sender_task.cancel()
+
+@app.get("/api/debug/memory")
+async def debug_memory(top: int = Query(20, ge=0, le=200), x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    report = memory.report()
+    report["process_rss_bytes"] = psutil.Process().memory_info().rss
+    # Snapshotting walks every traced block, so keep it off the event loop
+    report["top_allocations"] = await asyncio.to_thread(memory.top_allocations, top)
+    return report
+
+# Sampling profiler: POST with "seconds" blocks and returns folded stacks;
+# POST with "requests" arms it for the next N requests (with "seconds" as an
+# optional timeout, capped at profiler.MAX_PROFILE_SECONDS), fetch the result with GET
+@app.post("/api/admin/profile")
+async def start_profile(request: ProfileRequest, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    seconds = request.seconds if request.seconds or request.requests else 10.0
+    try:
+        profiler.start(seconds=seconds, requests=request.requests, interval_ms=request.interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if request.requests:
+        return profiler.status()
+    await asyncio.to_thread(profiler.wait)
+    return PlainTextResponse(profiler.folded())
+
+@app.get("/api/admin/profile")
+async def get_profile(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    status = profiler.status()
+    if status["status"] == "idle":
+        raise HTTPException(status_code=404, detail="No profile has been recorded")
+    if status["status"] == "running":
+        return APIResponse(status, status_code=202)
+    return PlainTextResponse(profiler.folded())
+
+@app.delete("/api/admin/profile")
+async def stop_profile(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    await asyncio.to_thread(profiler.stop)
+    return profiler.status()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,170 @@
+import os
+import sys
+import threading
+import tracemalloc
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Central memory accounting for in-process stores. Each store registers a
+# size function and an eviction function; when the registered stores together
+# exceed MEMORY_BUDGET_BYTES, every store above its weighted share of the
+# budget is asked to evict down to that share.
+MEMORY_BUDGET_BYTES = int(os.getenv("MEMORY_BUDGET_BYTES", str(256 * 1024 * 1024)))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "0"))
+
+if TRACEMALLOC_FRAMES > 0 and not tracemalloc.is_tracing():
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+
+_lock = threading.RLock()
+_stores: Dict[str, Dict[str, Any]] = {}
+
+
+class EntryTooLarge(ValueError):
+    """Raised when a single entry exceeds its store's share of the budget and would evict itself."""
+
+
+def approx_size(value: Any, depth: int = 4) -> int:
+    """Approximate deep size in bytes of JSON-like values (dicts, lists, strings)."""
+    size = sys.getsizeof(value)
+    if depth <= 0:
+        return size
+    if isinstance(value, dict):
+        size += sum(approx_size(k, depth - 1) + approx_size(v, depth - 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(approx_size(item, depth - 1) for item in value)
+    elif hasattr(value, "__dict__"):
+        size += approx_size(vars(value), depth - 1)
+    return size
+
+
+def register(name: str, size: Callable[[], int], evict: Callable[[int], int], weight: float = 1.0):
+    """Register a store. ``evict(target_bytes)`` must shrink it to at most the target and return bytes freed."""
+    with _lock:
+        if name in _stores:
+            raise ValueError(f"Memory store '{name}' is already registered")
+        _stores[name] = {"size": size, "evict": evict, "weight": weight, "evictions": 0, "evicted_bytes": 0}
+
+
+def unregister(name: str):
+    with _lock:
+        _stores.pop(name, None)
+
+
+def _shares() -> Dict[str, int]:
+    total_weight = sum(store["weight"] for store in _stores.values()) or 1.0
+    return {name: int(MEMORY_BUDGET_BYTES * store["weight"] / total_weight) for name, store in _stores.items()}
+
+
+def enforce() -> int:
+    """When the total is above budget, shrink every over-share store to its share; returns bytes freed."""
+    with _lock:
+        sizes = {name: store["size"]() for name, store in _stores.items()}
+        if sum(sizes.values()) <= MEMORY_BUDGET_BYTES:
+            return 0
+        freed = 0
+        for name, share in _shares().items():
+            if sizes[name] > share:
+                store = _stores[name]
+                released = store["evict"](share)
+                store["evictions"] += 1
+                store["evicted_bytes"] += released
+                freed += released
+        return freed
+
+
+def report() -> Dict[str, Any]:
+    with _lock:
+        shares = _shares()
+        stores = {
+            name: {
+                "bytes": store["size"](),
+                "weight": store["weight"],
+                "budget_bytes": shares[name],
+                "evictions": store["evictions"],
+                "evicted_bytes": store["evicted_bytes"]
+            }
+            for name, store in _stores.items()
+        }
+    return {
+        "budget_bytes": MEMORY_BUDGET_BYTES,
+        "total_bytes": sum(store["bytes"] for store in stores.values()),
+        "stores": stores
+    }
+
+
+def top_allocations(limit: int = 20) -> Optional[list]:
+    """Top tracemalloc allocation sites, or None when tracemalloc is not running."""
+    if not tracemalloc.is_tracing():
+        return None
+    stats = tracemalloc.take_snapshot().statistics("lineno")
+    return [
+        {
+            "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "bytes": stat.size,
+            "count": stat.count
+        }
+        for stat in stats[:limit]
+    ]
+
+
+class MemoryStore:
+    """Insertion-ordered mapping that tracks the approximate size of its entries and registers with the accountant."""
+
+    def __init__(self, name: str, weight: float = 1.0):
+        self.name = name
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        register(name, self.nbytes, self.evict, weight)
+
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __getitem__(self, key: str) -> Any:
+        return self._entries[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._entries.get(key, default)
+
+    def values(self) -> list:
+        with _lock:
+            return list(self._entries.values())
+
+    def __setitem__(self, key: str, value: Any):
+        size = approx_size(key) + approx_size(value)
+        with _lock:
+            share = _shares()[self.name]
+            if size > share:
+                raise EntryTooLarge(f"Entry of {size} bytes exceeds the {share} byte budget of '{self.name}'")
+            self._bytes += size - self._sizes.get(key, 0)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+        enforce()
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with _lock:
+            if key not in self._entries:
+                return default
+            self._bytes -= self._sizes.pop(key)
+            return self._entries.pop(key)
+
+    def evict(self, target_bytes: int) -> int:
+        # Oldest entries go first
+        freed = 0
+        with _lock:
+            while self._entries and self._bytes > target_bytes:
+                key, _ = self._entries.popitem(last=False)
+                size = self._sizes.pop(key)
+                self._bytes -= size
+                freed += size
+        return freed
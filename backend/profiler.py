@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Optional, Dict, Any
+import memory
+
+# On-demand sampling profiler. A background thread snapshots every thread's
+# stack with sys._current_frames() and aggregates them as folded stacks
+# ("thread;outer;...;inner count"), the input format of flamegraph.pl and
+# speedscope. Samples where the event loop thread sits outside the selector
+# are the stalls worth looking at.
+MAX_STACK_DEPTH = 128
+# Hard cap on any profile, so "next N requests" stops even if the traffic never comes
+MAX_PROFILE_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+
+_lock = threading.Lock()
+_stacks: Counter = Counter()
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+_state: Dict[str, Any] = {"status": "idle"}
+_stacks_bytes = 0
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample(own_ident: int):
+    global _stacks_bytes
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    for ident, frame in sys._current_frames().items():
+        if ident == own_ident:
+            continue
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.append(names.get(ident, f"thread-{ident}"))
+        stack = ";".join(reversed(labels))
+        if stack not in _stacks:
+            _stacks_bytes += sys.getsizeof(stack) + 64
+        _stacks[stack] += 1
+
+
+def _run(interval: float, deadline: float):
+    own_ident = threading.get_ident()
+    while not _stop.is_set():
+        with _lock:
+            _sample(own_ident)
+            _state["samples"] += 1
+        if time.monotonic() >= deadline:
+            break
+        _stop.wait(interval)
+    with _lock:
+        if (_state.get("requests_remaining") or 0) > 0 and not _stop.is_set():
+            _state["timed_out"] = True
+        _state["status"] = "done"
+        _state["finished_at"] = time.time()
+    # The finished profile now counts against the budget and can be evicted
+    memory.enforce()
+
+
+def is_running() -> bool:
+    return _state["status"] == "running"
+
+
+def start(seconds: Optional[float] = None, requests: Optional[int] = None, interval_ms: float = 5.0):
+    """Sample for ``seconds``, or until ``requests`` more requests have finished.
+
+    In requests mode ``seconds`` is a timeout; every profile stops after
+    MAX_PROFILE_SECONDS.
+    """
+    global _thread, _stacks_bytes
+    with _lock:
+        if _state["status"] == "running":
+            raise RuntimeError("Profiler is already running")
+        _stacks.clear()
+        _stacks_bytes = 0
+        _stop.clear()
+        _state.clear()
+        _state.update({
+            "status": "running",
+            "mode": "requests" if requests else "seconds",
+            "seconds": seconds,
+            "requests_remaining": requests,
+            "interval_ms": interval_ms,
+            "samples": 0,
+            "started_at": time.time()
+        })
+    deadline = time.monotonic() + min(seconds or MAX_PROFILE_SECONDS, MAX_PROFILE_SECONDS)
+    _thread = threading.Thread(target=_run, args=(interval_ms / 1000, deadline), name="sampling-profiler", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
+    if _thread is not None:
+        _thread.join()
+
+
+def wait():
+    if _thread is not None:
+        _thread.join()
+
+
+def request_finished():
+    # Counts down "next N requests" mode; cheap no-op otherwise
+    if _state.get("requests_remaining") is None or not is_running():
+        return
+    with _lock:
+        _state["requests_remaining"] -= 1
+        done = _state["requests_remaining"] <= 0
+    if done:
+        _stop.set()
+
+
+def status() -> Dict[str, Any]:
+    with _lock:
+        return {**_state, "distinct_stacks": len(_stacks)}
+
+
+def folded() -> str:
+    with _lock:
+        return "\n".join(f"{stack} {count}" for stack, count in _stacks.most_common()) + "\n"
+
+
+def _nbytes() -> int:
+    return _stacks_bytes
+
+
+def _evict(target_bytes: int) -> int:
+    # A finished profile is dropped whole; a running one is left alone
+    global _stacks_bytes
+    with _lock:
+        if is_running() or _stacks_bytes <= target_bytes:
+            return 0
+        freed = _stacks_bytes
+        _stacks.clear()
+        _stacks_bytes = 0
+        _state["evicted"] = True
+        return freed
+
+
+memory.register("profiler_stacks", _nbytes, _evict, weight=0.5)
@@ -0,0 +1,159 @@
+import os
+import gzip
+import asyncio
+import contextvars
+from typing import Any, Optional, FrozenSet
+
+import orjson
+from fastapi import Query
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from tracing import span
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Responses smaller than this go out uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+# Bodies at least this large are compressed in a worker thread, off the event loop
+COMPRESS_THREAD_MIN_BYTES = int(os.getenv("COMPRESS_THREAD_MIN_BYTES", str(256 * 1024)))
+
+# Field projection requested by the current request (?fields=a,b), if any
+response_fields: contextvars.ContextVar[Optional[FrozenSet[str]]] = contextvars.ContextVar("response_fields", default=None)
+# Key of the item list that ?fields= applies to, for routes that declare one
+response_items: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("response_items", default=None)
+
+
+async def field_projection(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to keep; list routes apply it to each item")
+):
+    # Async so the contextvar is set in the task that later renders the response
+    if fields:
+        response_fields.set(frozenset(field.strip() for field in fields.split(",") if field.strip()))
+
+
+def project_items(key: str):
+    """Route dependency: ?fields= projects each object in ``response[key]`` instead of the response itself."""
+    async def item_projection():
+        response_items.set(key)
+    return item_projection
+
+
+def project_fields(content: Any, fields: FrozenSet[str], items_key: Optional[str] = None) -> Any:
+    """Keep only ``fields`` of the response object, or of each object under ``items_key``.
+
+    With ``items_key`` the rest of the envelope (pagination fields) is left as is.
+    """
+    if not isinstance(content, dict):
+        return content
+    if items_key is None:
+        return {key: value for key, value in content.items() if key in fields}
+    items = content.get(items_key)
+    if not isinstance(items, list):
+        return content
+    projected = [
+        {key: value for key, value in item.items() if key in fields} if isinstance(item, dict) else item
+        for item in items
+    ]
+    return {**content, items_key: projected}
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class APIResponse(JSONResponse):
+    """orjson-backed JSON response that honours ?fields= and traces serialization."""
+
+    def render(self, content: Any) -> bytes:
+        fields = response_fields.get()
+        with span("serialize", projected=fields is not None) as attributes:
+            if fields is not None:
+                content = project_fields(content, fields, response_items.get())
+            body = dumps(content)
+            attributes["bytes"] = len(body)
+            return body
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    # Highest q-value wins; brotli beats gzip on ties
+    preferences = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        preferences[name.strip()] = quality
+    candidates = [("br", 1)] if brotli is not None else []
+    candidates.append(("gzip", 0))
+    wildcard = preferences.get("*", 0.0)
+    scored = [(preferences.get(name, wildcard), rank, name) for name, rank in candidates]
+    quality, _, name = max(scored)
+    return name if quality > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """Compress complete (non-streaming) HTTP responses with brotli or gzip per Accept-Encoding."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            # Streaming bodies, small bodies and pre-encoded bodies go out untouched
+            if message.get("more_body", False) or len(body) < self.minimum_size or "content-encoding" in headers:
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            with span("compress", encoding=encoding, bytes_in=len(body)) as attributes:
+                if len(body) >= COMPRESS_THREAD_MIN_BYTES:
+                    compressed = await asyncio.to_thread(compress, body, encoding)
+                else:
+                    compressed = compress(body, encoding)
+                attributes["bytes_out"] = len(compressed)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
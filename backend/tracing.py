@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import urllib.request
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Optional, Dict, Any, Iterator, List, Sequence
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider, ReadableSpan
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+# Per-request trace spans recorded with the OpenTelemetry SDK. The default
+# exporter appends OTLP/JSON ExportTraceServiceRequest bodies, one batch per
+# line, to a rotating local file; `python tracing.py replay` posts them to any
+# OTLP/HTTP collector, and any other SpanExporter can be passed to add_exporter().
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+TRACE_LOG_PATH = os.getenv(
+    "TRACE_LOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces.jsonl")
+)
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "5"))
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "ai-code-generator")
+# Finished spans waiting for export; when the exporter falls behind, new spans
+# are dropped instead of growing memory without bound
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "2048"))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT", "http://localhost:4318/v1/traces")
+
+_propagator = TraceContextTextMapPropagator()
+
+
+def _any_value(value: Any) -> Dict[str, Any]:
+    # OTLP/JSON AnyValue; 64-bit integers are strings in the JSON mapping
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_any_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _key_values(attributes) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _any_value(value)} for key, value in (attributes or {}).items()]
+
+
+def _otlp_span(span: ReadableSpan) -> Dict[str, Any]:
+    context = span.context
+    encoded = {
+        "traceId": format(context.trace_id, "032x"),
+        "spanId": format(context.span_id, "016x"),
+        "name": span.name,
+        # OTLP reserves 0 for SPAN_KIND_UNSPECIFIED, the SDK enum starts at INTERNAL
+        "kind": span.kind.value + 1,
+        "startTimeUnixNano": str(span.start_time),
+        "endTimeUnixNano": str(span.end_time),
+        "attributes": _key_values(span.attributes),
+        "status": {"code": span.status.status_code.value}
+    }
+    if span.parent is not None:
+        encoded["parentSpanId"] = format(span.parent.span_id, "016x")
+    if span.status.description:
+        encoded["status"]["message"] = span.status.description
+    return encoded
+
+
+def encode_otlp_json(spans: Sequence[ReadableSpan]) -> Dict[str, Any]:
+    """Encode finished spans as an OTLP/JSON ExportTraceServiceRequest."""
+    resources: Dict[int, Dict[str, Any]] = {}
+    for span in spans:
+        resource = resources.setdefault(id(span.resource), {"resource": span.resource, "scopes": {}})
+        scope = span.instrumentation_scope
+        key = (scope.name, scope.version) if scope else ("", None)
+        resource["scopes"].setdefault(key, []).append(_otlp_span(span))
+    return {"resourceSpans": [
+        {
+            "resource": {"attributes": _key_values(entry["resource"].attributes)},
+            "scopeSpans": [
+                {"scope": {"name": name, **({"version": version} if version else {})}, "spans": encoded}
+                for (name, version), encoded in entry["scopes"].items()
+            ]
+        }
+        for entry in resources.values()
+    ]}
+
+
+class JSONLinesSpanExporter(SpanExporter):
+    """Append each exported batch as one OTLP/JSON line to a size-rotated file."""
+
+    def __init__(self, path: str = TRACE_LOG_PATH, max_bytes: int = TRACE_LOG_MAX_BYTES, backups: int = TRACE_LOG_BACKUPS):
+        # Runs on the batch processor's worker thread, never on the event loop
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        line = json.dumps(encode_otlp_json(spans), separators=(",", ":"))
+        self._handler.handle(logging.makeLogRecord({"msg": line, "levelno": logging.INFO}))
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        self._handler.close()
+
+
+provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+_tracer = provider.get_tracer("ai-code-generator.backend")
+
+
+def add_exporter(exporter: SpanExporter):
+    """Ship spans to another exporter (OTLP, console, ...) in addition to the file."""
+    provider.add_span_processor(BatchSpanProcessor(exporter, max_queue_size=TRACE_QUEUE_SIZE))
+
+
+if TRACING_ENABLED:
+    add_exporter(JSONLinesSpanExporter())
+
+
+def _format_traceparent(context: trace.SpanContext) -> str:
+    return f"00-{context.trace_id:032x}-{context.span_id:016x}-{int(context.trace_flags):02x}"
+
+
+def current_traceparent() -> Optional[str]:
+    context = trace.get_current_span().get_span_context()
+    return _format_traceparent(context) if context.is_valid else None
+
+
+@contextmanager
+def span(name: str, kind: str = "INTERNAL", traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """Record a span around the block; yields its attribute dict for callers to extend.
+
+    Passing ``traceparent`` continues a remote trace (or starts a new one when it
+    is missing or invalid) instead of nesting under the current span.
+    """
+    parent = _propagator.extract({"traceparent": traceparent}) if traceparent is not None else None
+    with _tracer.start_as_current_span(
+        name, context=parent, kind=SpanKind[kind], record_exception=False, set_status_on_exception=False
+    ) as current:
+        status = Status(StatusCode.OK)
+        try:
+            yield attributes
+        except BaseException as e:
+            status = Status(StatusCode.ERROR, f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            current.set_attributes({
+                key: value if isinstance(value, (str, bool, int, float)) else str(value)
+                for key, value in attributes.items()
+            })
+            current.set_status(status)
+
+
+def replay(paths: Sequence[str], endpoint: str = OTLP_ENDPOINT, headers: Optional[Dict[str, str]] = None) -> int:
+    """POST every line of the given trace files to an OTLP/HTTP JSON endpoint; returns spans sent."""
+    sent = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = urllib.request.Request(
+                    endpoint, data=line.encode("utf-8"), method="POST",
+                    headers={"Content-Type": "application/json", **(headers or {})}
+                )
+                with urllib.request.urlopen(request, timeout=10):
+                    pass
+                sent += sum(
+                    len(scope["spans"])
+                    for resource in json.loads(line)["resourceSpans"]
+                    for scope in resource["scopeSpans"]
+                )
+    return sent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trace file utilities")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    replay_parser = subparsers.add_parser("replay", help="send recorded spans to an OTLP/HTTP collector")
+    replay_parser.add_argument("paths", nargs="+", help="trace files, e.g. traces.jsonl traces.jsonl.1")
+    replay_parser.add_argument("--endpoint", default=OTLP_ENDPOINT)
+    args = parser.parse_args()
+    print(f"sent {replay(args.paths, args.endpoint)} spans to {args.endpoint}", file=sys.stderr)
@@ -2,8 +2,16 @@ import streamlit as st
 import requests
 import json
 from typing import Dict, Any
-from datetime import datetime
+import os
 import urllib.parse
+import uuid
+import time
+from websockets.sync.client import connect
+
+API_URL = os.getenv("API_URL", "http://localhost:8000").rstrip("/")
+WS_CHAT_URL = API_URL.replace("http", "ws", 1) + "/ws/chat"
+STREAM_REFRESH_SECONDS = 0.1
+HISTORY_PAGE_SIZE = 20
 
 # Page config with enhanced styling
 st.set_page_config(
@@ -84,15 +92,100 @@ if "conversation_id" not in st.session_state:
     st.session_state.conversation_id = None
 if "language" not in st.session_state:
     st.session_state.language = "auto"
-if "history" not in st.session_state:
-    st.session_state.history = []
+if "history_page" not in st.session_state:
+    st.session_state.history_page = 0
+if "history_open" not in st.session_state:
+    st.session_state.history_open = None
+
+# Every backend call starts a new trace; the backend continues it through the
+# W3C traceparent header so client and server spans share a trace id
+def trace_headers() -> Dict[str, str]:
+    return {"traceparent": f"00-{uuid.uuid4().hex}-{uuid.uuid4().hex[:16]}-01"}
+
+# History lives in the backend store; the session only caches the summary page
+# being shown and the body of the one conversation the user has opened. The
+# conversation is upserted after every assistant turn, so nothing is lost when
+# the tab closes before "New Chat".
+def save_current_conversation():
+    if not st.session_state.messages:
+        return
+    if not st.session_state.conversation_id:
+        st.session_state.conversation_id = str(uuid.uuid4())
+    conversation_id = st.session_state.conversation_id
+    try:
+        requests.post(
+            f"{API_URL}/api/history",
+            json={"conversation_id": conversation_id, "messages": st.session_state.messages},
+            headers=trace_headers(),
+            timeout=10
+        )
+    except requests.exceptions.RequestException as e:
+        st.error(f"❌ Could not save conversation to history: {str(e)}")
+    st.session_state.pop("history_cache", None)
+    st.session_state.pop("history_body", None)
+
+def fetch_history_page(page: int) -> Dict[str, Any]:
+    cache = st.session_state.get("history_cache")
+    if cache is None or cache["page"] != page:
+        response = requests.get(
+            f"{API_URL}/api/history",
+            params={"offset": page * HISTORY_PAGE_SIZE, "limit": HISTORY_PAGE_SIZE},
+            headers=trace_headers(),
+            timeout=10
+        )
+        response.raise_for_status()
+        cache = {"page": page, "data": response.json()}
+        st.session_state.history_cache = cache
+    return cache["data"]
+
+def fetch_conversation(conversation_id: str) -> list:
+    cache = st.session_state.get("history_body")
+    if cache is None or cache["conversation_id"] != conversation_id:
+        response = requests.get(f"{API_URL}/api/history/{conversation_id}", headers=trace_headers(), timeout=10)
+        response.raise_for_status()
+        cache = response.json()
+        st.session_state.history_body = cache
+    return cache["messages"]
+
+# Chat requests go over the /ws/chat channel. If Streamlit reruns while a
+# request streams (e.g. the user submits a new prompt), the script stops, the
+# socket closes and the backend cancels the in-flight LLM calls.
+def stream_chat(request_data: Dict[str, Any], placeholder) -> Dict[str, Any]:
+    request_id = str(uuid.uuid4())
+    partial = {}
+    last_refresh = 0.0
+    with connect(WS_CHAT_URL, open_timeout=10) as ws:
+        ws.send(json.dumps({
+            "type": "chat",
+            "id": request_id,
+            # The prompt is already on screen; skip the echoed message
+            "fields": ["conversation_id", "code", "complexity", "docs", "language"],
+            **trace_headers(),
+            **request_data
+        }))
+        while True:
+            event = json.loads(ws.recv(timeout=60))
+            if event["type"] == "delta":
+                stage = event["stage"]
+                partial[stage] = partial.get(stage, "") + event["content"]
+                if time.monotonic() - last_refresh >= STREAM_REFRESH_SECONDS:
+                    last_refresh = time.monotonic()
+                    with placeholder.container():
+                        st.markdown(f"✍️ **Writing {stage}...**")
+                        st.code(partial[stage])
+            elif event["type"] == "result":
+                return event["data"]
+            elif event["type"] == "error":
+                raise RuntimeError(event["detail"])
+            elif event["type"] == "cancelled":
+                raise RuntimeError("Request was cancelled")
 
 # Check for shared code in URL
 query_params = st.query_params
 if "share" in query_params:
     share_id = query_params["share"][0]
     try:
-        response = requests.get(f"http://localhost:8000/api/shared/{share_id}")
+        response = requests.get(f"{API_URL}/api/shared/{share_id}", headers=trace_headers())
         if response.status_code == 200:
             shared_code = response.json()
             st.session_state.shared_code = shared_code
@@ -126,12 +219,7 @@ with st.sidebar:
     col1, col2 = st.columns(2)
     with col1:
         if st.button("🆕 New Chat", use_container_width=True):
-            if st.session_state.messages:
-                st.session_state.history.append({
-                    "conversation_id": st.session_state.conversation_id,
-                    "messages": st.session_state.messages.copy(),
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
+            save_current_conversation()
             st.session_state.messages = []
             st.session_state.conversation_id = None
             st.rerun()
@@ -225,11 +313,12 @@ with tab1:
                             with st.spinner("Generating unit tests..."):
                                 try:
                                     response = requests.post(
-                                        "http://localhost:8000/api/generate-tests",
+                                        f"{API_URL}/api/generate-tests",
                                         json={
                                             "code": message["code"],
                                             "language": message["language"]
-                                        }
+                                        },
+                                        headers=trace_headers()
                                     )
                                     
                                     if response.status_code == 200:
@@ -268,13 +357,14 @@ with tab1:
                                 if st.button("🚀 Share", key=f"share_btn_{i}"):
                                     try:
                                         response = requests.post(
-                                            "http://localhost:8000/api/share",
+                                            f"{API_URL}/api/share",
                                             json={
                                                 "code": message["code"],
                                                 "language": message["language"],
                                                 "title": title,
                                                 "description": description
-                                            }
+                                            },
+                                            headers=trace_headers()
                                         )
                                         
                                         if response.status_code == 200:
@@ -336,98 +426,123 @@ with tab1:
                     "language": None if st.session_state.language == "auto" else st.session_state.language
                 }
                 
-                response = requests.post(
-                    "http://localhost:8000/api/chat",
-                    json=request_data,
-                    timeout=60
-                )
+                result = stream_chat(request_data, thinking_placeholder)
+                st.session_state.conversation_id = result["conversation_id"]
+                thinking_placeholder.empty()
+                
+                st.success(f"✨ Generated {result['language']} code:")
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    st.session_state.conversation_id = result["conversation_id"]
-                    thinking_placeholder.empty()
+                if result["code"]:
+                    # Display code with action buttons
+                    col1, col2 = st.columns([3, 1])
                     
-                    st.success(f"✨ Generated {result['language']} code:")
+                    with col1:
+                        st.code(result["code"], language=result["language"])
                     
-                    if result["code"]:
-                        # Display code with action buttons
-                        col1, col2 = st.columns([3, 1])
+                    with col2:
+                        # Action buttons
+                        file_extensions = {"python": ".py", "javascript": ".js", "java": ".java", "cpp": ".cpp"}
+                        ext = file_extensions.get(result["language"], ".txt")
                         
-                        with col1:
-                            st.code(result["code"], language=result["language"])
+                        st.download_button(
+                            "📥 Download",
+                            data=result["code"],
+                            file_name=f"code{ext}",
+                            mime="text/plain",
+                            key="download_new",
+                            use_container_width=True
+                        )
                         
-                        with col2:
-                            # Action buttons
-                            file_extensions = {"python": ".py", "javascript": ".js", "java": ".java", "cpp": ".cpp"}
-                            ext = file_extensions.get(result["language"], ".txt")
-                            
-                            st.download_button(
-                                "📥 Download",
-                                data=result["code"],
-                                file_name=f"code{ext}",
-                                mime="text/plain",
-                                key="download_new",
-                                use_container_width=True
-                            )
-                            
-                            if st.button("🧪 Generate Tests", key="tests_new", use_container_width=True):
-                                st.session_state.generate_tests_new = True
-                                st.rerun()
-                            
-                            if st.button("🔗 Share", key="share_new", use_container_width=True):
-                                st.session_state.share_modal_new = True
-                                st.rerun()
-                    
-                    if result["complexity"]:
-                        with st.expander("📊 Complexity Analysis"):
-                            st.write(result["complexity"])
-                    
-                    if result["docs"]:
-                        with st.expander("📖 Documentation"):
-                            st.markdown(result["docs"])
-                    
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": f"Generated {result['language']} code:",
-                        "code": result["code"],
-                        "complexity": result["complexity"],
-                        "docs": result["docs"],
-                        "language": result["language"]
-                    })
-                    
-                else:
-                    thinking_placeholder.empty()
-                    st.error(f"❌ API Error: {response.status_code}")
-                    
-            except requests.exceptions.ConnectionError:
+                        if st.button("🧪 Generate Tests", key="tests_new", use_container_width=True):
+                            st.session_state.generate_tests_new = True
+                            st.rerun()
+                        
+                        if st.button("🔗 Share", key="share_new", use_container_width=True):
+                            st.session_state.share_modal_new = True
+                            st.rerun()
+                
+                if result["complexity"]:
+                    with st.expander("📊 Complexity Analysis"):
+                        st.write(result["complexity"])
+                
+                if result["docs"]:
+                    with st.expander("📖 Documentation"):
+                        st.markdown(result["docs"])
+                
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": f"Generated {result['language']} code:",
+                    "code": result["code"],
+                    "complexity": result["complexity"],
+                    "docs": result["docs"],
+                    "language": result["language"]
+                })
+                save_current_conversation()
+                
+            except (requests.exceptions.ConnectionError, ConnectionRefusedError):
                 thinking_placeholder.empty()
-                st.error("❌ Cannot connect to backend. Make sure the server is running on http://localhost:8000")
+                st.error(f"❌ Cannot connect to backend. Make sure the server is running on {API_URL}")
             except Exception as e:
                 thinking_placeholder.empty()
                 st.error(f"❌ Error: {str(e)}")
 
 with tab2:
-    # Enhanced history view
-    if st.session_state.history:
-        st.markdown("### 📚 Previous Conversations")
+    # Paginated history: only summary rows are rendered, message bodies are
+    # fetched on demand when a conversation is opened or restored.
+    try:
+        history = fetch_history_page(st.session_state.history_page)
+    except requests.exceptions.RequestException as e:
+        history = None
+        st.error(f"Error loading history: {str(e)}")
+    
+    if history and history["total"]:
+        total_pages = (history["total"] + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+        st.markdown(f"### 📚 Previous Conversations ({history['total']})")
         
-        for i, conversation in enumerate(reversed(st.session_state.history)):
-            with st.expander(f"💬 Conversation {len(st.session_state.history) - i} - {conversation['timestamp']}"):
-                for message in conversation["messages"]:
-                    with st.chat_message(message["role"]):
-                        if message["role"] == "user":
-                            st.write(message["content"])
-                        else:
+        for summary in history["items"]:
+            conversation_id = summary["conversation_id"]
+            col1, col2, col3 = st.columns([6, 1, 1])
+            with col1:
+                st.markdown(f"💬 **{summary['title']}**  \n"
+                            f"{summary['updated_at']} · {summary['message_count']} messages"
+                            + (f" · {summary['language']}" if summary["language"] else ""))
+            with col2:
+                is_open = st.session_state.history_open == conversation_id
+                if st.button("🙈 Hide" if is_open else "👁 View", key=f"view_{conversation_id}", use_container_width=True):
+                    st.session_state.history_open = None if is_open else conversation_id
+                    st.rerun()
+            with col3:
+                if st.button("🔄 Restore", key=f"restore_{conversation_id}", use_container_width=True):
+                    try:
+                        st.session_state.messages = fetch_conversation(conversation_id).copy()
+                        st.session_state.conversation_id = conversation_id
+                        st.success("✅ Conversation restored!")
+                        st.rerun()
+                    except requests.exceptions.RequestException as e:
+                        st.error(f"Error restoring conversation: {str(e)}")
+            
+            if st.session_state.history_open == conversation_id:
+                try:
+                    for message in fetch_conversation(conversation_id):
+                        with st.chat_message(message["role"]):
                             st.write(message["content"])
-                            if "code" in message and message["code"]:
+                            if message["role"] != "user" and message.get("code"):
                                 st.code(message["code"], language=message.get("language", "python"))
-                
-                if st.button(f"🔄 Restore Conversation {len(st.session_state.history) - i}", key=f"restore_{i}"):
-                    st.session_state.messages = conversation["messages"].copy()
-                    st.session_state.conversation_id = conversation["conversation_id"]
-                    st.success("✅ Conversation restored!")
-                    st.rerun()
-    else:
+                except requests.exceptions.RequestException as e:
+                    st.error(f"Error loading conversation: {str(e)}")
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ Newer", disabled=st.session_state.history_page == 0, use_container_width=True):
+                st.session_state.history_page -= 1
+                st.rerun()
+        with col2:
+            st.markdown(f"<div style='text-align: center'>Page {st.session_state.history_page + 1} of {total_pages}</div>", unsafe_allow_html=True)
+        with col3:
+            if st.button("Older ➡️", disabled=st.session_state.history_page + 1 >= total_pages, use_container_width=True):
+                st.session_state.history_page += 1
+                st.rerun()
+    elif history is not None:
         st.info("📝 No previous conversations yet. Start chatting to build your history!")
 
 with tab3:
@@ -435,7 +550,7 @@ with tab3:
     st.markdown("### 🌐 Community Shared Codes")
     
     try:
-        response = requests.get("http://localhost:8000/api/shared")
+        response = requests.get(f"{API_URL}/api/shared", headers=trace_headers())
         if response.status_code == 200:
             shared_codes = response.json()["shared_codes"]
             